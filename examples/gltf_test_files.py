@@ -3,20 +3,17 @@ import numpy as np
 
 from nexus3d.formats.gltf_writer import write_gltf_file
 from nexus3d.formats.interfaces import WriterInput
-from nexus3d.matrix import rotate, translate
+from nexus3d.matrix import batch_rotate, batch_translate
 
 
 def create_rot_test_file(angle: float = 20, gltf: bool = False):
     """Creates a rotation test file containing rotation around all three coordinate axes."""
-    rot_vecs = {
-        f"rot_x_{angle}": np.array([1, 0, 0]),
-        f"rot_y_{angle}": np.array([0, 1, 0]),
-        f"rot_z_{angle}": np.array([0, 0, 1]),
-    }
-
-    rotation_matrices = {}
-    for name, rot_vec in rot_vecs.items():
-        rotation_matrices[name] = rotate(np.deg2rad(angle), rot_vec)
+    rotation_matrices = dict(
+        zip(
+            [f"rot_x_{angle}", f"rot_y_{angle}", f"rot_z_{angle}"],
+            batch_rotate(np.full(3, np.deg2rad(angle)), np.identity(3)),
+        )
+    )
 
     write_gltf_file(
         WriterInput(
@@ -29,11 +26,12 @@ def create_rot_test_file(angle: float = 20, gltf: bool = False):
 
 def create_trans_test_file(distance: float = 0.1, gltf: bool = False):
     """Creates a translation test file containing translations along all three coordinate axes."""
-    trans_matrices = {
-        f"trans_x_{distance}": translate(np.array([distance, 0, 0])),
-        f"trans_y_{distance}": translate(np.array([0, distance, 0])),
-        f"trans_z_{distance}": translate(np.array([0, 0, distance])),
-    }
+    trans_matrices = dict(
+        zip(
+            [f"trans_x_{distance}", f"trans_y_{distance}", f"trans_z_{distance}"],
+            batch_translate(distance * np.identity(3)),
+        )
+    )
 
     write_gltf_file(
         WriterInput(
@@ -1,7 +1,7 @@
 """Create a coordinate system from NXtransformation groups"""
 
+import math
 from dataclasses import dataclass
-from functools import partial
 from typing import Dict
 
 import numpy as np
@@ -9,6 +9,9 @@ from numpy.typing import NDArray
 
 from nexus3d.nexus_transformations import transformation_matrices_from
 
+# Homogeneous origin, x, y and z basis vectors as columns
+_BASIS = np.eye(4)[:, [3, 0, 1, 2]]
+
 
 @dataclass
 class CoordinateSystem:
@@ -24,23 +27,17 @@ def coord_systems_from(
     fname: str, include_process: bool = False
 ) -> Dict[str, CoordinateSystem]:
     """Read all NXtransformations coordinate systems from the nexus file."""
-
-    def transform(
-        vector: NDArray[np.float64], matrix: NDArray[np.float64]
-    ) -> NDArray[np.float64]:
-        return (matrix @ vector.T)[:-1]
-
     transformation_matrices = transformation_matrices_from(fname, include_process)
 
     coordinate_systems = {}
 
     for name, transformation_matrix in transformation_matrices.items():
-        transform_vec = partial(transform, matrix=transformation_matrix)  # type: ignore
+        cols = (transformation_matrix @ _BASIS)[:-1]  # type: ignore
         coordinate_systems[name] = CoordinateSystem(
-            origin=transform_vec(np.array([0, 0, 0, 1])),
-            x_axis=transform_vec(np.array([1, 0, 0, 0])),
-            y_axis=transform_vec(np.array([0, 1, 0, 0])),
-            z_axis=transform_vec(np.array([0, 0, 1, 0])),
+            origin=cols[:, 0],
+            x_axis=cols[:, 1],
+            y_axis=cols[:, 2],
+            z_axis=cols[:, 3],
         )
 
     return coordinate_systems
@@ -48,7 +45,7 @@ def coord_systems_from(
 
 def unit_vector(vec: NDArray[np.float64]):
     """Calculates an unit vector"""
-    return vec / np.linalg.norm(vec)
+    return vec / math.hypot(*vec)
 
 
 def angle_between(vec1: NDArray[np.float64], vec2: NDArray[np.float64]):
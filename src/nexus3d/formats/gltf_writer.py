@@ -1,8 +1,10 @@
 """Functions for creating a gltf cube mesh file"""
 
 import logging
-from sys import version_info
-from typing import Any, Dict, List, Mapping, Union
+import os
+import struct
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
 
 import numpy as np
 import pygltflib
@@ -13,31 +15,123 @@ from nexus3d.formats.mesh import (
     create_cone_arrays,
     create_cube_arrays,
     get_mesh_from_stl,
+    optimize_vertex_fetch,
 )
-from nexus3d.matrix import rotate, translate
+from nexus3d.matrix import rotate
 
 TransformationMatrix = Union[Dict[str, NDArray[np.float64]], NDArray[np.float64]]
 TransformationMatrixDict = Mapping[str, TransformationMatrix]
 
 logger = logging.getLogger(__name__)
 
+_SHAPES = {"cube": create_cube_arrays, "cone": create_cone_arrays}
+_BEAM_INDICES = np.array([[0, 1]], dtype="uint8")
+_BEAM_VERTICES = np.array([[0, 0, 0], [0, 0, -1]], dtype="float32")
+_BEAM_VERTICES_BLENDER = np.array([[0, 0, 0], [0, -1, 0]], dtype="float32")
+_BEAM_INDICES.flags.writeable = False
+_BEAM_VERTICES.flags.writeable = False
+_BEAM_VERTICES_BLENDER.flags.writeable = False
+_BOUNDS_BLOCK_SIZE = 1024
+_COMPONENT_TYPES = {
+    np.dtype("int8"): pygltflib.BYTE,
+    np.dtype("uint8"): pygltflib.UNSIGNED_BYTE,
+    np.dtype("int16"): pygltflib.SHORT,
+    np.dtype("uint16"): pygltflib.UNSIGNED_SHORT,
+    np.dtype("uint32"): pygltflib.UNSIGNED_INT,
+    np.dtype("float32"): pygltflib.FLOAT,
+}
+_STL_ROTATION_AXES = tuple(zip(["rot_x", "rot_y", "rot_z"], np.identity(3)))
+
+
+@lru_cache(maxsize=None)
+def get_shape_arrays(shape: str, scale: float):
+    """Get the vertex fetch optimized indices and vertices arrays of a shape.
+    The arrays are cached per shape and scale and must not be modified.
+
+    Args:
+        shape (str): The name of the shape, either `cube` or `cone`.
+        scale (float): The scale of the shape.
+
+    Returns:
+        (np.ndarray, np.ndarray): The points and triangles array of the shape.
+    """
+    indices, vertices = optimize_vertex_fetch(*_SHAPES[shape](scale))
+    indices.flags.writeable = False
+    vertices.flags.writeable = False
+
+    return indices, vertices
+
+
+@lru_cache(maxsize=8)
+def _load_stl_arrays(filename: str, unit: Optional[str], _mtime: float):
+    # The stl vertices are already in the order of their first use
+    indices, vertices = get_mesh_from_stl(filename, unit)
+    indices.flags.writeable = False
+    vertices.flags.writeable = False
+
+    return indices, vertices
+
+
+def get_stl_arrays(filename: str, unit: Optional[str] = None):
+    """Get the vertex fetch optimized indices and vertices arrays from a stl file.
+    The arrays are cached until the file is modified and must not be modified.
+
+    Args:
+        filename (str): The stl filename
+        unit (str): A pint interpretable unit which to interpret from the stl file.
+
+    Returns:
+        (np.ndarray, np.ndarray): The points and triangles array of the stl model.
+    """
+    return _load_stl_arrays(os.path.abspath(filename), unit, os.path.getmtime(filename))
+
 
 def get_binary_blobs(indices: NDArray[np.uint8], vertices: NDArray[np.float32]):
     """Converts points and triangles arrays to binary blobs.
+    The blobs are flat uint8 views, so contiguous arrays are not copied.
 
     Args:
         vertices (NDArray[np.float32]): The vertices array
         indices (NDArray[np.uint8]): The indices array
 
     Returns:
-        (bytes, bytes): The vertices and indices binary blob
+        (NDArray[np.uint8], NDArray[np.uint8]): The indices and vertices binary blob
     """
-    vertices_bin = vertices.flatten().tobytes()
-    indices_bin = indices.tobytes()
+    vertices_bin = np.ascontiguousarray(vertices).view(np.uint8).reshape(-1)
+    indices_bin = np.ascontiguousarray(indices).view(np.uint8).reshape(-1)
 
     return indices_bin, vertices_bin
 
 
+def get_vertex_bounds(
+    vertices: NDArray[np.float32],
+) -> Tuple[NDArray[np.float32], NDArray[np.float32]]:
+    """Gets the componentwise minimum and maximum of a vertices array.
+    Blocks of rows are reduced as one long row, so numpy runs over contiguous
+    memory instead of reducing three strided columns.
+
+    Args:
+        vertices (NDArray[np.float32]): The vertices array
+
+    Returns:
+        (NDArray[np.float32], NDArray[np.float32]): The minimum and maximum vertex
+    """
+    vertices = np.ascontiguousarray(vertices)
+    rows = len(vertices) - len(vertices) % _BOUNDS_BLOCK_SIZE
+    if not rows:
+        return vertices.min(axis=0), vertices.max(axis=0)
+
+    blocks = vertices[:rows].reshape(-1, _BOUNDS_BLOCK_SIZE * vertices.shape[1])
+    minima = np.concatenate(
+        [blocks.min(axis=0).reshape(_BOUNDS_BLOCK_SIZE, -1), vertices[rows:]]
+    )
+    maxima = np.concatenate(
+        [blocks.max(axis=0).reshape(_BOUNDS_BLOCK_SIZE, -1), vertices[rows:]]
+    )
+
+    return minima.min(axis=0), maxima.max(axis=0)
+
+
 def set_data(
     gltf: pygltflib.GLTF2,
     indices_list: List[NDArray[np.uint8]],
@@ -57,71 +151,87 @@ def set_data(
     if len(indices_list) != len(vertices_list):
         raise ValueError("Indices list and vertices list must have the same length.")
 
-    gltf_type = {
-        "int8": pygltflib.BYTE,
-        "uint8": pygltflib.UNSIGNED_BYTE,
-        "int16": pygltflib.SHORT,
-        "uint16": pygltflib.UNSIGNED_SHORT,
-        "uint32": pygltflib.UNSIGNED_INT,
-        "float32": pygltflib.FLOAT,
-    }
-
-    binary_data = b""
-    offset = 0
-    gltf.accesors = []
-    gltf.bufferViews = []
-
-    for i, (indices, vertices) in enumerate(zip(indices_list, vertices_list)):
-        indices_bin, vertices_bin = get_binary_blobs(indices, vertices)
-
-        gltf.accessors.append(
+    blobs = [
+        blob
+        for indices, vertices in zip(indices_list, vertices_list)
+        for blob in get_binary_blobs(indices, vertices)
+    ]
+    nbytes = np.array([len(blob) for blob in blobs], dtype=np.int64)
+    # Pad each chunk so the following chunk is aligned to 4 bytes
+    offsets = np.concatenate([[0], np.cumsum(nbytes + -nbytes % 4)[:-1]])
+    byte_length = int(offsets[-1] + nbytes[-1]) if blobs else 0
+
+    vertex_bounds = [get_vertex_bounds(vertices) for vertices in vertices_list]
+    gltf.accessors = [
+        accessor
+        for i, (indices, vertices, (vertices_min, vertices_max)) in enumerate(
+            zip(indices_list, vertices_list, vertex_bounds)
+        )
+        for accessor in (
             pygltflib.Accessor(
                 bufferView=2 * i,
-                componentType=gltf_type[str(indices.dtype)],
+                componentType=_COMPONENT_TYPES[indices.dtype],
                 count=indices.size,
                 type=pygltflib.SCALAR,
                 max=[int(indices.max())],
                 min=[int(indices.min())],
-            )
-        )
-
-        gltf.accessors.append(
+            ),
             pygltflib.Accessor(
                 bufferView=2 * i + 1,
-                componentType=gltf_type[str(vertices.dtype)],
+                componentType=_COMPONENT_TYPES[vertices.dtype],
                 count=len(vertices),
                 type=pygltflib.VEC3,
-                max=vertices.max(axis=0).tolist(),
-                min=vertices.min(axis=0).tolist(),
-            )
+                max=vertices_max.tolist(),
+                min=vertices_min.tolist(),
+            ),
         )
-
-        gltf.bufferViews.append(
-            pygltflib.BufferView(
-                buffer=0,
-                byteOffset=offset,
-                byteLength=len(indices_bin),
-                target=pygltflib.ELEMENT_ARRAY_BUFFER,
-            )
+    ]
+    gltf.bufferViews = [
+        pygltflib.BufferView(
+            buffer=0,
+            byteOffset=offset,
+            byteLength=length,
+            target=pygltflib.ARRAY_BUFFER if i % 2 else pygltflib.ELEMENT_ARRAY_BUFFER,
         )
+        for i, (offset, length) in enumerate(zip(offsets.tolist(), nbytes.tolist()))
+    ]
 
-        fill_offset = offset + len(indices_bin) % len(vertices_bin)
-        fill_offset_bin = b"\x00" * fill_offset
+    # The padding between the chunks is left zero-filled
+    binary_data = bytearray(byte_length)
+    binary_view = memoryview(binary_data)
+    for offset, blob in zip(offsets.tolist(), blobs):
+        binary_view[offset : offset + len(blob)] = blob
 
-        gltf.bufferViews.append(
-            pygltflib.BufferView(
-                buffer=0,
-                byteOffset=offset + len(indices_bin) + fill_offset,
-                byteLength=len(vertices_bin),
-                target=pygltflib.ARRAY_BUFFER,
-            )
-        )
+    gltf.buffers = [pygltflib.Buffer(byteLength=byte_length)]
+    gltf.set_binary_blob(binary_data)
 
-        offset += len(indices_bin) + len(vertices_bin) + fill_offset
-        binary_data += indices_bin + fill_offset_bin + vertices_bin
 
-    gltf.buffers = [pygltflib.Buffer(byteLength=offset)]
-    gltf.set_binary_blob(binary_data)
+def save_glb(gltf: pygltflib.GLTF2, filename: str):
+    """Saves a gltf object as glb file.
+    The binary blob is expected to be laid out as written by `set_data`
+    and is streamed to the file as is.
+
+    Args:
+        gltf (pygltflib.GLTF2): The gltf object to save.
+        filename (str): The glb filename to write to.
+    """
+    json_blob = gltf.gltf_to_json(separators=(",", ":"), indent=None).encode("utf-8")
+    json_length = len(json_blob) + -len(json_blob) % 4
+    binary_blob = gltf.binary_blob() or b""
+    binary_padding = -len(binary_blob) % 4
+    binary_length = len(binary_blob) + binary_padding
+
+    # Everything up to the binary data is assembled in a single buffer
+    header = bytearray(b" " * (12 + 8 + json_length + 8))
+    struct.pack_into("<4sII", header, 0, b"glTF", 2, len(header) + binary_length)
+    struct.pack_into("<I4s", header, 12, json_length, b"JSON")
+    header[20 : 20 + len(json_blob)] = json_blob
+    struct.pack_into("<I4s", header, 20 + json_length, binary_length, b"BIN\x00")
+
+    with open(filename, "wb") as glb_file:
+        glb_file.write(header)
+        glb_file.write(memoryview(binary_blob))
+        glb_file.write(b"\x00" * binary_padding)
 
 
 def clean_name(name: str, entry_name: str):
@@ -131,18 +241,6 @@ def clean_name(name: str, entry_name: str):
         name (str): The name of the transformation path
         entry_name (str): The name of the current entry
     """
-
-    def remove_prefix(text, prefix):
-        if text.startswith(prefix):
-            return text[len(prefix) :]
-        return text
-
-    if version_info.minor < 9:
-        return remove_prefix(
-            remove_prefix(remove_prefix(name, "/entry/"), entry_name),
-            "/transformations/",
-        ).replace("/transformations", "")
-
     return (
         name.removeprefix("/entry/")
         .removeprefix(entry_name)
@@ -151,6 +249,31 @@ def clean_name(name: str, entry_name: str):
     )
 
 
+def get_stl_shift(config_dict: Dict[str, Any]) -> Optional[NDArray[np.float64]]:
+    """Gets the matrix of the stl transformations from a config dict.
+
+    Args:
+        config_dict (Dict[str, Any]): The config dict to read transformations from.
+
+    Returns:
+        Optional[NDArray[np.float64]]:
+            The transformation matrix or None if the transformations are the identity.
+    """
+    shift = np.identity(4)
+
+    for rot, rot_axis in _STL_ROTATION_AXES:
+        if rot in config_dict:
+            shift = rotate(np.deg2rad(config_dict[rot]), rot_axis) @ shift
+
+    # The translation is applied before the rotations
+    shift[:3, 3] = [config_dict.get(axis, 0) for axis in ["x", "y", "z"]]
+
+    if np.array_equal(shift, np.identity(4)):
+        return None
+
+    return shift
+
+
 def apply_stl_transformations(
     config_dict: Dict[str, Any], matrix: NDArray[np.float64]
 ) -> NDArray[np.float64]:
@@ -164,29 +287,11 @@ def apply_stl_transformations(
     Returns:
         NDArray[np.float64]: The transformed matrix
     """
-    translations = np.zeros(3)
-    rot_matrix = np.identity(4)
-    apply_translation = apply_rotation = False
-
-    for i, axis in enumerate(["x", "y", "z"]):
-        translations[i] = config_dict.get(axis, 0)
-        apply_translation = True
-
-    for rot, rot_axis in zip(
-        ["rot_x", "rot_y", "rot_z"],
-        [np.array([1, 0, 0]), np.array([0, 1, 0]), np.array([0, 0, 1])],
-    ):
-        if rot in config_dict:
-            rot_matrix = rotate(np.deg2rad(config_dict[rot]), rot_axis) @ rot_matrix
-            apply_rotation = True
-
-    if apply_translation:
-        matrix = matrix @ translate(translations)
-
-    if apply_rotation:
-        matrix = matrix @ rot_matrix
+    shift = get_stl_shift(config_dict)
+    if shift is None:
+        return matrix
 
-    return matrix
+    return matrix @ shift
 
 
 def write_gltf_file(cli_input: WriterInput):
@@ -200,43 +305,70 @@ def write_gltf_file(cli_input: WriterInput):
     """
 
     def add_stl_shift(name: str, matrix: TransformationMatrix) -> TransformationMatrix:
-        if name not in cli_input.config_dict:
+        if name not in stl_shifts:
             return matrix
 
+        shift = stl_shifts[name]
         if isinstance(matrix, dict):
-            matrix["stl_shift"] = apply_stl_transformations(
-                cli_input.config_dict[name], matrix[next(reversed(matrix))]
-            )
+            last_matrix = matrix[next(reversed(matrix))]
+            matrix["stl_shift"] = last_matrix if shift is None else last_matrix @ shift
             return matrix
 
-        return apply_stl_transformations(cli_input.config_dict[name], matrix)
+        return matrix if shift is None else matrix @ shift
 
     def append_nodes(mesh_indices: Dict[str, int]):
-        for name, matrix in cli_input.transformation_matrices.items():
-            children = []
-            if isinstance(matrix, dict):
-                for j, (cname, cmat) in enumerate(
-                    add_stl_shift(name, matrix).items()  # type: ignore
-                ):
-                    gltf.nodes.append(
-                        pygltflib.Node(
-                            mesh=mesh_indices[name],
-                            matrix=list(cmat.T.flat),
-                            name=f"{j}-{clean_name(cname, name)}",
-                        )
+        shifted_matrices = {
+            name: add_stl_shift(name, matrix)
+            for name, matrix in cli_input.transformation_matrices.items()
+        }
+        # gltf expects the node matrices as flat lists in column-major order
+        node_matrices = iter(
+            np.array(
+                [
+                    cmat
+                    for matrix in shifted_matrices.values()
+                    for cmat in (
+                        matrix.values() if isinstance(matrix, dict) else [matrix]
                     )
-                    children.append(len(gltf.nodes) - 1)
-
-            gltf.nodes.append(pygltflib.Node(mesh=mesh_indices[name], name=name))
+                ]
+            )
+            .reshape(-1, 4, 4)
+            .transpose(0, 2, 1)
+            .reshape(-1, 16)
+            .tolist()
+        )
 
-            if children:
-                gltf.nodes[-1].children = children
+        nodes: List[pygltflib.Node] = []
+        scene_nodes = []
+        for name, matrix in shifted_matrices.items():
+            if isinstance(matrix, dict) and matrix:
+                first_child = len(gltf.nodes) + len(nodes)
+                nodes.extend(
+                    pygltflib.Node(
+                        mesh=mesh_indices[name],
+                        matrix=next(node_matrices),
+                        name=f"{j}-{clean_name(cname, name)}",
+                    )
+                    for j, cname in enumerate(matrix)
+                )
+                nodes.append(
+                    pygltflib.Node(
+                        mesh=mesh_indices[name],
+                        name=name,
+                        children=list(range(first_child, first_child + len(matrix))),
+                    )
+                )
             else:
-                gltf.nodes[-1].matrix = list(
-                    add_stl_shift(name, matrix).T.flat  # type: ignore
+                nodes.append(
+                    pygltflib.Node(
+                        mesh=mesh_indices[name], matrix=next(node_matrices), name=name
+                    )
                 )
 
-            gltf.scenes[gltf.scene].nodes.append(len(gltf.nodes) - 1)
+            scene_nodes.append(len(gltf.nodes) + len(nodes) - 1)
+
+        gltf.nodes.extend(nodes)
+        gltf.scenes[gltf.scene].nodes.extend(scene_nodes)
 
     def append_mesh(mode: int = 4):
         gltf.meshes.append(
@@ -252,30 +384,34 @@ def write_gltf_file(cli_input: WriterInput):
         )
 
     def create_meshs():
-        shapes = {"cube": create_cube_arrays, "cone": create_cone_arrays}
         mesh_indices = {}
+        stl_mesh_indices: Dict[Tuple[str, Optional[str]], int] = {}
         shape_index = None
         for name in cli_input.transformation_matrices:
             if name in cli_input.config_dict and "file" in cli_input.config_dict[name]:
-                stl_indices, stl_vertices = get_mesh_from_stl(
+                stl_key = (
                     cli_input.config_dict[name]["file"],
                     cli_input.config_dict[name].get("unit"),
                 )
-
-                indices.append(stl_indices)
-                vertices.append(stl_vertices)
-                mesh_indices[name] = len(vertices) - 1
-                append_mesh()
+                if stl_key not in stl_mesh_indices:
+                    stl_indices, stl_vertices = get_stl_arrays(*stl_key)
+                    indices.append(stl_indices)
+                    vertices.append(stl_vertices)
+                    stl_mesh_indices[stl_key] = len(vertices) - 1
+                    append_mesh()
+
+                mesh_indices[name] = stl_mesh_indices[stl_key]
                 continue
 
             if shape_index is None:
-                if cli_input.shape not in shapes:
+                if cli_input.shape not in _SHAPES:
                     logger.warning(
                         "Shape `%s` not valid. Using cones as default.", cli_input.shape
                     )
-                shape_indices, shape_vertices = shapes.get(
-                    cli_input.shape, create_cone_arrays
-                )(cli_input.size / 2)
+                shape_indices, shape_vertices = get_shape_arrays(
+                    cli_input.shape if cli_input.shape in _SHAPES else "cone",
+                    cli_input.size / 2,
+                )
                 indices.append(shape_indices)
                 vertices.append(shape_vertices)
                 shape_index = len(vertices) - 1
@@ -286,6 +422,9 @@ def write_gltf_file(cli_input: WriterInput):
 
     if cli_input.config_dict is None:
         cli_input.config_dict = {}
+    stl_shifts = {
+        name: get_stl_shift(config) for name, config in cli_input.config_dict.items()
+    }
 
     gltf = pygltflib.GLTF2(
         scene=0,
@@ -300,12 +439,9 @@ def write_gltf_file(cli_input: WriterInput):
 
     if cli_input.show_beam:
         vertices.append(
-            np.array(
-                [[0, 0, 0], [0, -1, 0] if cli_input.beam_blender else [0, 0, -1]],
-                dtype="float32",
-            )
+            _BEAM_VERTICES_BLENDER if cli_input.beam_blender else _BEAM_VERTICES
         )
-        indices.append(np.array([[0, 1]], dtype="uint8"))
+        indices.append(_BEAM_INDICES)
         gltf.nodes.append(pygltflib.Node(mesh=len(indices) - 1, name="beam"))
 
         gltf.scenes[gltf.scene].nodes.append(len(gltf.nodes) - 1)
@@ -314,4 +450,7 @@ def write_gltf_file(cli_input: WriterInput):
 
     set_data(gltf, indices, vertices)
 
-    gltf.save(cli_input.output)
+    if os.path.splitext(cli_input.output)[1] == ".glb":
+        save_glb(gltf, cli_input.output)
+    else:
+        gltf.save(cli_input.output)
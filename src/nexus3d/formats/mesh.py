@@ -1,11 +1,84 @@
 """Cube mesh utility functions (e.g. creating cube arrays)"""
 
+import os
 from typing import Optional
 
 import numpy as np
+import pandas as pd
 from stl import mesh
 
-from nexus3d.units import ureg
+from nexus3d.units import get_ureg
+
+_CUBE_VERTICES = np.array(
+    [
+        [-0.5, -1, -2],
+        [+0.5, -1, -2],
+        [+0.5, +1, -2],
+        [-0.5, +1, -2],
+        [-0.5, -1, +2],
+        [+0.5, -1, +2],
+        [+0.5, +1, +2],
+        [-0.5, +1, +2],
+    ],
+    dtype="float32",
+)
+_CUBE_INDICES = np.array(
+    [
+        [0, 3, 1],
+        [1, 3, 2],
+        [0, 4, 7],
+        [0, 7, 3],
+        [4, 5, 6],
+        [4, 6, 7],
+        [5, 1, 2],
+        [5, 2, 6],
+        [2, 3, 6],
+        [3, 7, 6],
+        [0, 1, 5],
+        [0, 5, 4],
+    ],
+    dtype="uint8",
+)
+_CUBE_VERTICES.flags.writeable = False
+_CUBE_INDICES.flags.writeable = False
+
+_CONE_ASPECT_RATIO = 2
+_CONE_VERTICES = (
+    np.array(
+        [
+            [0, 0, 0],
+            [-1.3, 0, -_CONE_ASPECT_RATIO],
+            [-0.809017, -0.587785, -_CONE_ASPECT_RATIO],
+            [-0.309017, -0.951057, -_CONE_ASPECT_RATIO],
+            [0.309017, -0.951057, -_CONE_ASPECT_RATIO],
+            [0.809017, -0.587785, -_CONE_ASPECT_RATIO],
+            [1.3, 0, -_CONE_ASPECT_RATIO],
+            [0.809017, 0.587785, -_CONE_ASPECT_RATIO],
+            [0.309017, 0.951057, -_CONE_ASPECT_RATIO],
+            [-0.309017, 0.951057, -_CONE_ASPECT_RATIO],
+            [-0.809017, 0.587785, -_CONE_ASPECT_RATIO],
+        ],
+        dtype="float32",
+    )
+    / _CONE_ASPECT_RATIO
+)
+_CONE_INDICES = np.array(
+    [
+        [0, 1, 2],
+        [0, 2, 3],
+        [0, 3, 4],
+        [0, 4, 5],
+        [0, 5, 6],
+        [0, 6, 7],
+        [0, 7, 8],
+        [0, 8, 9],
+        [0, 9, 10],
+        [0, 10, 1],
+    ],
+    dtype="uint8",
+)
+_CONE_VERTICES.flags.writeable = False
+_CONE_INDICES.flags.writeable = False
 
 
 def create_cube_arrays(scale: float = 1):
@@ -16,39 +89,12 @@ def create_cube_arrays(scale: float = 1):
 
     Returns:
         (np.ndarray, np.ndarray): The points and triangles array of the cube.
+            The unscaled arrays are shared and read-only.
     """
-    vertices = np.array(
-        [
-            [-0.5, -1, -2],
-            [+0.5, -1, -2],
-            [+0.5, +1, -2],
-            [-0.5, +1, -2],
-            [-0.5, -1, +2],
-            [+0.5, -1, +2],
-            [+0.5, +1, +2],
-            [-0.5, +1, +2],
-        ],
-        dtype="float32",
-    )
-    indices = np.array(
-        [
-            [0, 3, 1],
-            [1, 3, 2],
-            [0, 4, 7],
-            [0, 7, 3],
-            [4, 5, 6],
-            [4, 6, 7],
-            [5, 1, 2],
-            [5, 2, 6],
-            [2, 3, 6],
-            [3, 7, 6],
-            [0, 1, 5],
-            [0, 5, 4],
-        ],
-        dtype="uint8",
-    )
+    if scale == 1:
+        return _CUBE_INDICES, _CUBE_VERTICES
 
-    return indices, vertices * scale
+    return _CUBE_INDICES, _CUBE_VERTICES * np.float32(scale)
 
 
 def create_cone_arrays(scale: float = 1):
@@ -59,64 +105,89 @@ def create_cone_arrays(scale: float = 1):
 
     Returns:
         (np.ndarray, np.ndarray): The points and triangles array of the cone.
+            The unscaled arrays are shared and read-only.
     """
-    aspect_ratio = 2
-    vertices = (
-        np.array(
-            [
-                [0, 0, 0],
-                [-1.3, 0, -aspect_ratio],
-                [-0.809017, -0.587785, -aspect_ratio],
-                [-0.309017, -0.951057, -aspect_ratio],
-                [0.309017, -0.951057, -aspect_ratio],
-                [0.809017, -0.587785, -aspect_ratio],
-                [1.3, 0, -aspect_ratio],
-                [0.809017, 0.587785, -aspect_ratio],
-                [0.309017, 0.951057, -aspect_ratio],
-                [-0.309017, 0.951057, -aspect_ratio],
-                [-0.809017, 0.587785, -aspect_ratio],
-            ],
-            dtype="float32",
-        )
-        / aspect_ratio
-    )
+    if scale == 1:
+        return _CONE_INDICES, _CONE_VERTICES
 
-    indices = np.array(
-        [
-            [0, 1, 2],
-            [0, 2, 3],
-            [0, 3, 4],
-            [0, 4, 5],
-            [0, 5, 6],
-            [0, 6, 7],
-            [0, 7, 8],
-            [0, 8, 9],
-            [0, 9, 10],
-            [0, 10, 1],
-        ],
-        dtype="uint8",
-    )
+    return _CONE_INDICES, _CONE_VERTICES * np.float32(scale)
+
+
+def optimize_vertex_fetch(indices: np.ndarray, vertices: np.ndarray):
+    """Reorders the vertices in the order they are first referenced by the indices.
+    This improves the locality of vertex fetches when rendering the mesh.
+    All vertices are expected to be referenced by the indices.
 
-    return indices, vertices * scale
+    Args:
+        indices (np.ndarray): The triangles array.
+        vertices (np.ndarray): The points array.
+
+    Returns:
+        (np.ndarray, np.ndarray): The remapped triangles and reordered points array.
+    """
+    _, first_use = np.unique(indices.ravel(), return_index=True)
+    order = np.argsort(first_use)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+
+    return remap[indices].astype(indices.dtype), vertices[order]
+
+
+def read_stl_triangles(filename: str) -> np.ndarray:
+    """Reads the triangle corners from a stl file.
+    Binary stl files are memory-mapped instead of being read into memory.
+
+    Args:
+        filename (str): The stl filename
+
+    Returns:
+        np.ndarray: The (n, 3, 3) array of triangle corners.
+    """
+    header_size = 84
+    with open(filename, "rb") as stl_file:
+        stl_file.seek(header_size - 4)
+        count = int.from_bytes(stl_file.read(4), "little")
+
+    if os.path.getsize(filename) == header_size + count * mesh.Mesh.dtype.itemsize:
+        return np.memmap(
+            filename,
+            dtype=mesh.Mesh.dtype,
+            mode="r",
+            offset=header_size,
+            shape=(count,),
+        )["vectors"]
+
+    return mesh.Mesh.from_file(filename).vectors
 
 
 def get_mesh_from_stl(filename: str, unit: Optional[str] = None):
     """Reads a mesh as array of indices and vertices from a stl file.
+    The vertices are returned in the order they are first referenced by the indices,
+    so they need no further `optimize_vertex_fetch`.
 
     Args:
         filename (str): The stl filename
         unit (str): A pint interpretable unit which to interpret from the stl file.
     """
-    stl_mesh = mesh.Mesh.from_file(filename)
+    triangles = read_stl_triangles(filename)
+
+    # Hash the corners column by column, compacting the combined codes after
+    # each column so they stay below the number of corners.
+    indices_lin = np.zeros(triangles.shape[0] * 3, dtype=np.int64)
+    for axis in range(3):
+        column_codes, column_uniques = pd.factorize(
+            triangles[:, :, axis].ravel(), use_na_sentinel=False
+        )
+        indices_lin, _ = pd.factorize(indices_lin * len(column_uniques) + column_codes)
 
-    vertices, indices_lin = np.unique(
-        stl_mesh.vectors.reshape([stl_mesh.vectors.size // 3, 3]),
-        axis=0,
-        return_inverse=True,
-    )
+    # Codes are assigned in order of appearance,
+    # so each new code first appears where the running maximum increases.
+    first_use = np.flatnonzero(np.diff(np.maximum.accumulate(indices_lin), prepend=-1))
+    vertices = triangles[first_use // 3, first_use % 3]
 
+    # The maximum index is reserved as primitive restart value in gltf
     for dtype in ["uint8", "uint16", "uint32"]:
-        if indices_lin.max() < np.iinfo(dtype).max:
+        if len(vertices) - 1 < np.iinfo(dtype).max:
             break
 
         if dtype == "uint32":
@@ -124,9 +195,12 @@ def get_mesh_from_stl(filename: str, unit: Optional[str] = None):
                 f"The stl model `{filename}` is too large to be converted into gltf."
             )
 
-    indices = indices_lin.reshape([indices_lin.size // 3, 3]).astype(dtype)
+    indices = indices_lin.reshape(-1, 3).astype(dtype)
 
     if unit is not None:
-        scaling = ureg(f"1 {unit}").to("m").magnitude  # type: ignore
-        return indices, vertices * scaling
+        scaling = get_ureg().Quantity(1, unit).to("m").magnitude  # type: ignore
+        if scaling != 1:
+            # The gathered vertices are a fresh array, so they are scaled in place
+            vertices *= scaling
+
     return indices, vertices
@@ -13,6 +13,12 @@ TransformationMatrixDict = Mapping[
     str, Union[Dict[str, NDArray[np.float64]], NDArray[np.float64]]
 ]
 
+_CUBE_INDICES, _CUBE_VERTICES = create_cube_arrays()
+_CUBE_TEMPLATE = np.zeros(len(_CUBE_INDICES), dtype=mesh.Mesh.dtype)
+_CUBE_TEMPLATE["vectors"] = _CUBE_VERTICES[_CUBE_INDICES]
+# The face corners of the cube as columns, shape (3, 36)
+_CUBE_CORNERS = _CUBE_TEMPLATE["vectors"].reshape(-1, 3).T
+
 
 def create_cube_mesh(scale: float = 1.0):
     """Creates a cube mesh.
@@ -23,14 +29,10 @@ def create_cube_mesh(scale: float = 1.0):
     Returns:
         stl.mesh: The cube mesh at the origin
     """
-    indices, vertices = create_cube_arrays(scale)
-
-    cube = mesh.Mesh(np.zeros(indices.shape[0], dtype=mesh.Mesh.dtype))
-    for i, face in enumerate(indices):
-        for j in range(3):
-            cube.vectors[i][j] = vertices[face[j], :]
+    cube = _CUBE_TEMPLATE.copy()
+    cube["vectors"] *= scale
 
-    return cube
+    return mesh.Mesh(cube)
 
 
 def cube_meshs_from(
@@ -45,15 +47,13 @@ def cube_meshs_from(
     Returns:
         mesh: The composed mesh containing a cube for each transformation matrix.
     """
-    scene = None
-    for transformation_matrix in transformation_matrices.values():
-        cube = create_cube_mesh(scale)
-        cube.transform(transformation_matrix)
-
-        if scene is None:
-            scene = cube.data
-            continue
-        scene = np.concatenate((scene, cube.data))
+    # The stl vertices are single precision, so the corners are computed in it
+    matrices = np.array(list(transformation_matrices.values()), dtype=np.float32)
+    corners = scale * matrices[:, :3, :3] @ _CUBE_CORNERS + matrices[:, :3, 3:]
+
+    scene = np.empty(len(matrices) * len(_CUBE_TEMPLATE), dtype=mesh.Mesh.dtype)
+    scene["vectors"] = corners.transpose(0, 2, 1).reshape(-1, 3, 3)
+    scene["attr"] = 0
 
     return mesh.Mesh(scene)
 
@@ -1,9 +1,10 @@
 """Transformation matrices for nexus"""
 
-from typing import Optional
+import math
+from functools import lru_cache
+from typing import Optional, Tuple
 
 import numpy as np
-from numpy.linalg import norm
 from numpy.typing import NDArray
 
 
@@ -13,7 +14,8 @@ def rotate(
     offset: Optional[NDArray[np.float64]] = None,
     left_handed: bool = False,
 ) -> NDArray[np.float64]:
-    """Generates a 4D rotation matrix
+    """Generates a 4D rotation matrix.
+    Matrices for repeated arguments are served from a cache.
 
     Returns:
         np.ndarray[(4, 4), float]: The 4D rotation matrix
@@ -21,59 +23,90 @@ def rotate(
     if offset is None:
         offset = np.zeros(3)
 
-    v_x, v_y, v_z = axis / norm(axis)
-    cosa = np.cos(angle)
+    return _rotation_matrix(
+        float(angle), tuple(map(float, axis)), tuple(map(float, offset)), left_handed
+    ).copy()
+
+
+@lru_cache(maxsize=256)
+def _rotation_matrix(
+    angle: float,
+    axis: Tuple[float, ...],
+    offset: Tuple[float, ...],
+    left_handed: bool,
+) -> NDArray[np.float64]:
+    v_x, v_y, v_z = axis
+    axis_norm = math.hypot(v_x, v_y, v_z)
+    v_x, v_y, v_z = v_x / axis_norm, v_y / axis_norm, v_z / axis_norm
+    cosa = math.cos(angle)
+    cosa1 = 1 - cosa
+    sina = math.sin(angle)
+
+    # Swapping the y and z axes maps the matrix into a left-handed system
+    x, y, z = (0, 2, 1) if left_handed else (0, 1, 2)
+
+    matrix = np.identity(4)
+    matrix[x, x] = cosa + v_x**2 * cosa1
+    matrix[x, y] = v_x * v_y * cosa1 - v_z * sina
+    matrix[x, z] = v_x * v_z * cosa1 + v_y * sina
+    matrix[y, x] = v_y * v_x * cosa1 + v_z * sina
+    matrix[y, y] = cosa + v_y**2 * cosa1
+    matrix[y, z] = v_y * v_z * cosa1 - v_x * sina
+    matrix[z, x] = v_z * v_x * cosa1 - v_y * sina
+    matrix[z, y] = v_z * v_y * cosa1 + v_x * sina
+    matrix[z, z] = cosa + v_z**2 * cosa1
+    matrix[x, 3], matrix[y, 3], matrix[z, 3] = offset
+    matrix.flags.writeable = False
+
+    return matrix
+
+
+def batch_rotate(
+    angles: NDArray[np.float64],
+    axes: NDArray[np.float64],
+    offset: Optional[NDArray[np.float64]] = None,
+    left_handed: bool = False,
+) -> NDArray[np.float64]:
+    """Generates a stack of 4D rotation matrices.
+    The angles and the axes are broadcast against each other,
+    so either a single axis or one axis per angle may be given.
+
+    Args:
+        angles (NDArray[np.float64]): The (n,) array of rotation angles.
+        axes (NDArray[np.float64]): The (3,) or (n, 3) array of rotation axes.
+        offset (Optional[NDArray[np.float64]], optional):
+            The (3,) or (n, 3) array of offsets. Defaults to None.
+        left_handed (bool, optional):
+            Whether to rotate in a left-handed system. Defaults to False.
+
+    Returns:
+        np.ndarray[(n, 4, 4), float]: The 4D rotation matrices
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    axes = np.asarray(axes, dtype=np.float64)
+    axes = axes / np.linalg.norm(axes, axis=-1, keepdims=True)
+    v_x, v_y, v_z = np.moveaxis(axes, -1, 0)
+    cosa = np.cos(angles)
     cosa1 = 1 - cosa
-    sina = np.sin(angle)
-
-    if left_handed:
-        return np.array(
-            [
-                [
-                    cosa + v_x**2 * cosa1,
-                    v_x * v_z * cosa1 + v_y * sina,
-                    v_x * v_y * cosa1 - v_z * sina,
-                    offset[0],
-                ],
-                [
-                    v_z * v_x * cosa1 - v_y * sina,
-                    cosa + v_z**2 * cosa1,
-                    v_z * v_y * cosa1 + v_x * sina,
-                    offset[2],
-                ],
-                [
-                    v_y * v_x * cosa1 + v_z * sina,
-                    v_y * v_z * cosa1 - v_x * sina,
-                    cosa + v_y**2 * cosa1,
-                    offset[1],
-                ],
-                [0, 0, 0, 1],
-            ]
-        )
-
-    return np.array(
-        [
-            [
-                cosa + v_x**2 * cosa1,
-                v_x * v_y * cosa1 - v_z * sina,
-                v_x * v_z * cosa1 + v_y * sina,
-                offset[0],
-            ],
-            [
-                v_y * v_x * cosa1 + v_z * sina,
-                cosa + v_y**2 * cosa1,
-                v_y * v_z * cosa1 - v_x * sina,
-                offset[1],
-            ],
-            [
-                v_z * v_x * cosa1 - v_y * sina,
-                v_z * v_y * cosa1 + v_x * sina,
-                cosa + v_z**2 * cosa1,
-                offset[2],
-            ],
-            [0, 0, 0, 1],
-        ]
-    )
+    sina = np.sin(angles)
+
+    x, y, z = (0, 2, 1) if left_handed else (0, 1, 2)
+
+    matrices = np.zeros(np.broadcast_shapes(angles.shape, axes.shape[:-1]) + (4, 4))
+    matrices[..., x, x] = cosa + v_x**2 * cosa1
+    matrices[..., x, y] = v_x * v_y * cosa1 - v_z * sina
+    matrices[..., x, z] = v_x * v_z * cosa1 + v_y * sina
+    matrices[..., y, x] = v_y * v_x * cosa1 + v_z * sina
+    matrices[..., y, y] = cosa + v_y**2 * cosa1
+    matrices[..., y, z] = v_y * v_z * cosa1 - v_x * sina
+    matrices[..., z, x] = v_z * v_x * cosa1 - v_y * sina
+    matrices[..., z, y] = v_z * v_y * cosa1 + v_x * sina
+    matrices[..., z, z] = cosa + v_z**2 * cosa1
+    if offset is not None:
+        matrices[..., [x, y, z], 3] = offset
+    matrices[..., 3, 3] = 1
+
+    return matrices
 
 
 def rotate_z_onto_vec(
@@ -90,17 +123,13 @@ def rotate_z_onto_vec(
     Returns:
         np.ndarray[(4, 4), float]: The 4D rotation matrix
     """
-    if offset is None:
-        offset = np.zeros(3)
+    matrix = np.zeros((4, 4))
+    matrix[0, 2], matrix[1, 2], matrix[2, 2] = vec[0], vec[1], vec[2]
+    if offset is not None:
+        matrix[0, 3], matrix[1, 3], matrix[2, 3] = offset[0], offset[1], offset[2]
+    matrix[3, 3] = 1
 
-    return np.array(
-        [
-            [0, 0, vec[0], offset[0]],
-            [0, 0, vec[1], offset[1]],
-            [0, 0, vec[2], offset[2]],
-            [0, 0, 0, 1],
-        ]
-    )
+    return matrix
 
 
 def translate(
@@ -113,19 +142,41 @@ def translate(
     Returns:
         np.ndarray[(4, 4), float]: The translation matrix.
     """
-    trans = translation
+    trans = translation if offset is None else np.add(translation, offset)
+
+    x, y, z = (0, 2, 1) if left_handed else (0, 1, 2)
+
+    matrix = np.identity(4)
+    matrix[x, 3], matrix[y, 3], matrix[z, 3] = trans
+
+    return matrix
+
+
+def batch_translate(
+    translations: NDArray[np.float64],
+    offset: Optional[NDArray[np.float64]] = None,
+    left_handed: bool = False,
+) -> NDArray[np.float64]:
+    """Generates a stack of 4D translation matrices.
+
+    Args:
+        translations (NDArray[np.float64]): The (n, 3) array of translations.
+        offset (Optional[NDArray[np.float64]], optional):
+            The (3,) or (n, 3) array of offsets. Defaults to None.
+        left_handed (bool, optional):
+            Whether to translate in a left-handed system. Defaults to False.
+
+    Returns:
+        np.ndarray[(n, 4, 4), float]: The translation matrices.
+    """
+    translations = np.asarray(translations, dtype=np.float64)
     if offset is not None:
-        trans += offset
-
-    if left_handed:
-        x, y, z = trans[0], trans[2], trans[1]
-    else:
-        x, y, z = trans[0], trans[1], trans[2]
-    return np.array(
-        [
-            [1, 0, 0, x],
-            [0, 1, 0, y],
-            [0, 0, 1, z],
-            [0, 0, 0, 1],
-        ]
-    )
+        translations = translations + offset
+
+    x, y, z = (0, 2, 1) if left_handed else (0, 1, 2)
+
+    matrices = np.zeros(translations.shape[:-1] + (4, 4))
+    matrices[..., [0, 1, 2, 3], [0, 1, 2, 3]] = 1
+    matrices[..., [x, y, z], 3] = translations
+
+    return matrices
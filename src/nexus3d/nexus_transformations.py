@@ -2,11 +2,10 @@
 
 import json
 import os
-from collections import OrderedDict
+import posixpath
 from dataclasses import dataclass
 from os import path
-from sys import version_info
-from typing import Any, Callable, Dict, Mapping, Union
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
 
 import click
 import h5py
@@ -17,8 +16,8 @@ from numpy.typing import NDArray
 from nexus3d.formats.gltf_writer import write_gltf_file
 from nexus3d.formats.interfaces import WriterInput
 from nexus3d.formats.stl_writer import write_stl_file
-from nexus3d.matrix import rotate, translate
-from nexus3d.units import ureg
+from nexus3d.matrix import batch_rotate, batch_translate, rotate
+from nexus3d.units import si_factor
 
 TransformationMatrixDict = Mapping[
     str, Union[Dict[str, NDArray[np.float64]], NDArray[np.float64]]
@@ -33,10 +32,16 @@ class Config:
 
 
 cs_config = Config()
+_REQUIRED_ATTRS = ("depends_on", "vector", "transformation_type", "units")
+_BLENDER_ROTATION = rotate(np.deg2rad(-90), np.array([1, 0, 0]))
+_BLENDER_ROTATION.flags.writeable = False
 
 
 def transformation_matrices_xarray(
-    fname: str, include_process: bool = False, store_intermediate: bool = False
+    fname: str,
+    include_process: bool = False,
+    store_intermediate: bool = False,
+    blender: bool = False,
 ) -> TransformationMatrixXarray:
     """
     Reads the transformation matrices from a file and generates a dict of xarray's.
@@ -49,6 +54,9 @@ def transformation_matrices_xarray(
         store_intermediate (bool, optional):
             If True the complete chain with all intermediate matrices are stored.
             Defaults to False.
+        blender (bool, optional):
+            If True the coordinate system is rotated to be aligned with blender.
+            Defaults to False.
 
     Returns:
         TransformationMatrixXarray:
@@ -62,11 +70,29 @@ def transformation_matrices_xarray(
 
         return matrix
 
-    def get_transformation_matrix(h5file: h5py.File, entry: str):
-        required_attrs = ["depends_on", "vector", "transformation_type", "units"]
-        attrs = h5file[entry].attrs
+    def get_transformation_node(entry: str) -> Optional[Tuple[Dict[str, Any], Any]]:
+        node_path = f"/{entry.lstrip('/')}"
+        if node_path not in transformation_nodes:
+            # visititems neither follows soft or external links nor visits
+            # every name of a hard linked object, so look those up directly
+            dataset = h5file.get(node_path)
+            if not isinstance(dataset, h5py.Dataset):
+                return None
+            transformation_nodes[node_path] = (dict(dataset.attrs), dataset[()])
+
+        return transformation_nodes[node_path]
+
+    def get_local_transformation(entry: str) -> Tuple[xr.DataArray, Optional[str]]:
+        if entry in local_transformations:
+            return local_transformations[entry]
+
+        node = get_transformation_node(entry)
+        if node is None:
+            raise ValueError(f"No transformation found at {entry}")
 
-        for req_attr in required_attrs:
+        attrs, field = node
+
+        for req_attr in _REQUIRED_ATTRS:
             if req_attr not in attrs:
                 raise ValueError(f"`{req_attr}` attribute not found in {entry}")
 
@@ -74,104 +100,125 @@ def transformation_matrices_xarray(
             raise ValueError(
                 f"Found `offset` attribute in {entry} but no `offset_units` could be found."
             )
-        offset = attrs.get("offset", np.zeros((3,)))
-        offset_unit = ureg(attrs.get("offset_unit", ""))
-        offset_si = (offset * offset_unit).to_base_units().magnitude
+        offset_si = (
+            attrs["offset"] * si_factor(attrs.get("offset_unit", ""))
+            if "offset" in attrs
+            else None
+        )
 
         vector = attrs["vector"]
 
-        field = h5file[entry][()]
         if isinstance(field, np.ndarray) and field.ndim == 1:
-            matrices = xr.DataArray(
-                np.zeros((len(field), 4, 4)),
-                dims=[entry, "m1", "m2"],
-                coords={entry: field},
-            )
+            field_values = field
         elif isinstance(
             field, (int, float, np.int32, np.int64, np.float32, np.float64)
         ):
-            matrices = xr.DataArray(
-                np.zeros((1, 4, 4)), dims=[entry, "m1", "m2"], coords={entry: [field]}
-            )
+            field_values = np.array([field])
         else:
             raise NotImplementedError(
                 "Only 0D and 1D numeric fields are supported yet, "
                 f"but {entry}: {field} is {type(field)}"
             )
 
-        for i, point in enumerate(matrices):
-            field = point[entry].values.flat[0]
-            field_si = ureg(f"{field} {attrs['units']}").to_base_units().magnitude  # type: ignore
+        fields_si = field_values * si_factor(attrs["units"])
+        if attrs["transformation_type"] == "translation":
+            values = batch_translate(
+                fields_si[:, np.newaxis] * vector,
+                offset_si,
+                left_handed=cs_config.left_handed,
+            )
+        elif attrs["transformation_type"] == "rotation":
+            values = batch_rotate(
+                fields_si, vector, offset_si, left_handed=cs_config.left_handed
+            )
+        else:
+            raise ValueError(
+                f"Unknown transformation type `{attrs['transformation_type']}`"
+            )
 
-            if attrs["transformation_type"] == "translation":
-                matrices[i] = translate(
-                    field_si * vector, offset_si, left_handed=cs_config.left_handed
-                )
-            elif attrs["transformation_type"] == "rotation":
-                matrices[i] = rotate(
-                    field_si, vector, offset_si, left_handed=cs_config.left_handed
-                )
-            else:
-                raise ValueError(
-                    f"Unknown transformation type `{attrs['transformation_type']}`"
-                )
+        if blender and attrs["depends_on"] == ".":
+            # Rotating the chain roots aligns every matrix composed from them
+            values = _BLENDER_ROTATION @ values
+
+        matrices = xr.DataArray(
+            values, dims=[entry, "m1", "m2"], coords={entry: field_values}
+        )
 
-        if attrs["depends_on"] == ".":
-            return store_in_chain(entry, matrices)
-
-        if "/" in attrs["depends_on"]:
-            return store_in_chain(
-                entry,
-                xr.apply_ufunc(
-                    np.matmul,
-                    get_transformation_matrix(h5file, attrs["depends_on"]),
-                    matrices,
-                    input_core_dims=[["m1", "m2"], ["m1", "m2"]],
-                    output_core_dims=[["m1", "m2"]],
-                    vectorize=True,
-                ),
+        depends_on = attrs["depends_on"]
+        if depends_on == ".":
+            parent = None
+        elif depends_on.startswith("/"):
+            parent = depends_on
+        else:
+            parent = posixpath.normpath(
+                posixpath.join(posixpath.dirname(entry), depends_on)
             )
+            if "/" in depends_on and get_transformation_node(parent) is None:
+                # Paths without a leading slash may also be given from the root
+                parent = depends_on
+
+        local_transformations[entry] = (matrices, parent)
+        return local_transformations[entry]
+
+    def get_transformation_matrix(entry: str) -> xr.DataArray:
+        chain = [entry]
+        _, parent = get_local_transformation(entry)
+        while parent is not None:
+            if parent in chain:
+                raise ValueError(f"Circular `depends_on` chain found at {parent}")
+            chain.append(parent)
+            _, parent = get_local_transformation(parent)
+
+        matrix = None
+        for link in reversed(chain):
+            if link not in transformations:
+                local_matrix, _ = local_transformations[link]
+                transformations[link] = (
+                    local_matrix
+                    if matrix is None
+                    else xr.apply_ufunc(
+                        np.matmul,
+                        matrix,
+                        local_matrix,
+                        input_core_dims=[["m1", "m2"], ["m1", "m2"]],
+                        output_core_dims=[["m1", "m2"]],
+                    )
+                )
+            matrix = store_in_chain(link, transformations[link])
 
-        return store_in_chain(
-            entry,
-            xr.apply_ufunc(
-                np.matmul,
-                get_transformation_matrix(
-                    h5file, f"{entry.rsplit('/', 1)[0]}/{attrs['depends_on']}"
-                ),
-                matrices,
-                input_core_dims=[["m1", "m2"], ["m1", "m2"]],
-                output_core_dims=[["m1", "m2"]],
-                vectorize=True,
-            ),
-        )
+        return matrix
+
+    def collect_transformations(name: str, dataset: h5py.Dataset):
+        if isinstance(dataset, h5py.Dataset):
+            attrs = dataset.attrs
+            if "transformation_type" in attrs or "depends_on" in attrs:
+                transformation_nodes[f"/{name}"] = (dict(attrs), dataset[()])
+                return
 
-    def get_transformation_group_names(name: str, dataset: h5py.Dataset):
         if not include_process and name.startswith("entry/process"):
             return
 
-        if "depends_on" in name:
+        if name.endswith("/depends_on") or name == "depends_on":
             transformation_groups[
-                name.rsplit("/", 1)[0].split("/", 1)[-1]
-                if version_info.minor < 9
-                else name.removesuffix("/depends_on").removeprefix("entry/")
+                name.removesuffix("/depends_on").removeprefix("entry/")
             ] = dataset[()].decode("utf-8")
 
     transformation_groups: Dict[str, h5py.Dataset] = {}
     transformation_matrices = {}
+    local_transformations: Dict[str, Tuple[xr.DataArray, Optional[str]]] = {}
+    transformations: Dict[str, xr.DataArray] = {}
+    transformation_nodes: Dict[str, Tuple[Dict[str, Any], Any]] = {}
     with h5py.File(fname, "r") as h5file:
-        h5file.visititems(get_transformation_group_names)
+        h5file.visititems(collect_transformations)
 
         for name, transformation_group in transformation_groups.items():
             if store_intermediate:
-                matrix_chain: Dict[str, xr.DataArray] = OrderedDict()
+                matrix_chain: Dict[str, xr.DataArray] = {}
 
             if "/" in transformation_group and not transformation_group.startswith("/"):
                 transformation_group = f"{name}/{transformation_group}"
 
-            transformation_matrix = get_transformation_matrix(
-                h5file, transformation_group
-            )
+            transformation_matrix = get_transformation_matrix(transformation_group)
 
             transformation_matrices[name] = (
                 matrix_chain if store_intermediate else transformation_matrix
@@ -181,41 +228,64 @@ def transformation_matrices_xarray(
 
 
 def transformation_matrices_from(
-    fname: str, include_process: bool, store_intermediate: bool = False
+    fname: str,
+    include_process: bool,
+    store_intermediate: bool = False,
+    blender: bool = False,
 ) -> TransformationMatrixDict:
     """
     Reads all NXtransformations from a nexus file
     and creates a transformation matrix from them.
     """
     tmatrices = transformation_matrices_xarray(
-        fname, include_process, store_intermediate
+        fname, include_process, store_intermediate, blender
     )
 
-    transformation_matrices_flat: Dict[Any, Any] = {}
-    for entry, value in tmatrices.items():
-        if isinstance(value, dict):
-            transformation_matrices_flat[entry] = {}
-            for subentry in value:
-                transformation_matrices_flat[entry][subentry] = (
-                    value[subentry].values.flat[:16].reshape(4, 4)
-                )
-            continue
-        transformation_matrices_flat[entry] = value.values.flat[:16].reshape(4, 4)
+    def first_matrix(matrices: xr.DataArray) -> NDArray[np.float64]:
+        # The matrix axes are always the last two dimensions
+        return matrices.values.reshape(-1, 4, 4)[0].copy()
 
-    return transformation_matrices_flat
+    return {
+        entry: (
+            {subentry: first_matrix(matrix) for subentry, matrix in value.items()}
+            if isinstance(value, dict)
+            else first_matrix(value)
+        )
+        for entry, value in tmatrices.items()
+    }
 
 
 def apply_blender_transform(
     transformations: TransformationMatrixDict,
 ) -> TransformationMatrixDict:
-    """Applyes a transformation to align the CS in blender."""
-    blender_rot = rotate(np.deg2rad(-90), np.array([1, 0, 0]))
+    """Applyes a transformation to align the CS in blender.
 
-    for key, val in transformations.items():
-        if isinstance(val, dict):
-            transformations[key] = apply_blender_transform(val)  # type: ignore
-        else:
-            transformations[key] = blender_rot @ val  # type: ignore
+    Writeable float matrices are rotated in place, others are replaced by
+    rotated copies. Matrices stored under several keys are rotated only once.
+    """
+    # Maps the ids of visited values to the values and their rotated results
+    rotated: Dict[int, Tuple[Any, Any]] = {}
+    stack = [transformations]
+    while stack:
+        matrices = stack.pop()
+        for key, val in matrices.items():
+            if id(val) in rotated:
+                matrices[key] = rotated[id(val)][1]  # type: ignore
+                continue
+
+            result: Any = val
+            if isinstance(val, dict):
+                stack.append(val)
+            elif (
+                isinstance(val, np.ndarray)
+                and val.flags.writeable
+                and np.issubdtype(val.dtype, np.floating)
+            ):
+                result = np.matmul(_BLENDER_ROTATION, val, out=val)
+            else:
+                result = _BLENDER_ROTATION @ val
+                matrices[key] = result  # type: ignore
+            rotated[id(val)] = (val, result)
 
     return transformations
 
@@ -365,10 +435,8 @@ def cli(  # pylint: disable=too-many-arguments
     }
 
     transformation_matrices = transformation_matrices_from(
-        file, include_process, store_intermediate
+        file, include_process, store_intermediate, blender
     )
-    if blender:
-        transformation_matrices = apply_blender_transform(transformation_matrices)
 
     format_map.get(file_format, format_not_implemented)(
         WriterInput(
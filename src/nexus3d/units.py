@@ -1,5 +1,46 @@
 """A pint unit registry for nexus3d"""
 
-from pint import UnitRegistry
+import math
+from functools import lru_cache
+from typing import Any
 
-ureg = UnitRegistry()  # type: ignore
+
+@lru_cache(maxsize=1)
+def get_ureg():
+    """The pint unit registry, which is only imported and built on first use."""
+    from pint import UnitRegistry  # noqa: PLC0415
+
+    return UnitRegistry()  # type: ignore
+
+
+def __getattr__(name: str) -> Any:
+    if name == "ureg":
+        return get_ureg()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Common NeXus length and angle units, which are converted without pint
+_SI_FACTORS = {
+    "": 1.0,
+    "m": 1.0,
+    "cm": 1e-2,
+    "mm": 1e-3,
+    "um": 1e-6,
+    "µm": 1e-6,
+    "nm": 1e-9,
+    "angstrom": 1e-10,
+    "rad": 1.0,
+    "mrad": 1e-3,
+    "deg": math.pi / 180,
+    "degree": math.pi / 180,
+    "degrees": math.pi / 180,
+}
+
+
+@lru_cache(maxsize=None)
+def si_factor(unit: str) -> float:
+    """The factor to convert a value given in `unit` to SI base units."""
+    if unit in _SI_FACTORS:
+        return _SI_FACTORS[unit]
+
+    return float(get_ureg().Quantity(1, unit).to_base_units().magnitude)  # type: ignore
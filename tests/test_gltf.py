@@ -0,0 +1,111 @@
+"""Tests for gltf file functions"""
+
+import numpy as np
+import pygltflib
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+
+from nexus3d.formats.gltf_writer import (
+    get_stl_shift,
+    get_vertex_bounds,
+    set_data,
+    write_gltf_file,
+)
+from nexus3d.formats.interfaces import WriterInput
+from nexus3d.formats.mesh import (
+    create_cone_arrays,
+    create_cube_arrays,
+    get_mesh_from_stl,
+    optimize_vertex_fetch,
+)
+from nexus3d.formats.stl_writer import write_stl_file
+from nexus3d.matrix import rotate, translate
+
+
+def test_set_data_alignment():
+    """Test whether the buffer views are aligned and contain the mesh data"""
+    meshes = [create_cube_arrays(2.0), create_cone_arrays(), create_cube_arrays()]
+    gltf = pygltflib.GLTF2()
+    set_data(gltf, [mesh[0] for mesh in meshes], [mesh[1] for mesh in meshes])
+
+    blob = gltf.binary_blob()
+    assert gltf.buffers[0].byteLength == len(blob)
+
+    for i, (indices, vertices) in enumerate(meshes):
+        indices_view = gltf.bufferViews[2 * i]
+        vertices_view = gltf.bufferViews[2 * i + 1]
+
+        assert vertices_view.byteOffset % 4 == 0
+        assert vertices_view.byteOffset - indices_view.byteOffset < indices.nbytes + 4
+
+        assert_array_equal(
+            np.frombuffer(
+                blob,
+                dtype=indices.dtype,
+                count=indices.size,
+                offset=indices_view.byteOffset,
+            ).reshape(indices.shape),
+            indices,
+        )
+        assert_array_almost_equal(
+            np.frombuffer(
+                blob,
+                dtype=np.float32,
+                count=vertices.size,
+                offset=vertices_view.byteOffset,
+            ).reshape(vertices.shape),
+            vertices,
+        )
+
+
+def test_shared_stl_mesh(tmp_path):
+    """Test whether nodes with the same stl file share one gltf mesh"""
+    stl_file = tmp_path / "cube.stl"
+    write_stl_file(WriterInput(stl_file, {"test": np.identity(4)}, 2.0, False, {}))
+
+    output = tmp_path / "experiment.glb"
+    write_gltf_file(
+        WriterInput(
+            str(output),
+            {name: np.identity(4) for name in ["a", "b", "c"]},
+            0.1,
+            show_beam=True,
+            config_dict={"a": {"file": str(stl_file)}, "b": {"file": str(stl_file)}},
+        )
+    )
+
+    gltf = pygltflib.GLTF2().load(str(output))
+    assert len(gltf.meshes) == 3
+    assert [node.mesh for node in gltf.nodes] == [0, 0, 1, 2]
+
+
+def test_stl_vertices_in_first_use_order(tmp_path):
+    """Test whether stl vertices need no further vertex fetch optimization"""
+    stl_file = tmp_path / "cube.stl"
+    write_stl_file(WriterInput(stl_file, {"test": np.identity(4)}, 2.0, False, {}))
+
+    indices, vertices = get_mesh_from_stl(str(stl_file))
+    optimized_indices, optimized_vertices = optimize_vertex_fetch(indices, vertices)
+    assert_array_equal(optimized_indices, indices)
+    assert_array_equal(optimized_vertices, vertices)
+
+
+def test_stl_shift():
+    """Test whether the stl shift translates before rotating"""
+    config = {"x": 1, "y": 2, "z": 3, "rot_z": 90}
+    expected = translate(np.array([1.0, 2.0, 3.0])) @ rotate(
+        np.deg2rad(90), np.array([0, 0, 1])
+    )
+
+    assert_array_almost_equal(get_stl_shift(config), expected)
+    assert get_stl_shift({"file": "model.stl", "x": 0}) is None
+
+
+def test_vertex_bounds():
+    """Test whether the blocked vertex bounds match a plain reduction"""
+    rng = np.random.default_rng(0)
+    for rows in [1, 1024, 3000]:
+        vertices = rng.normal(size=(rows, 3)).astype(np.float32)
+        vertices_min, vertices_max = get_vertex_bounds(vertices)
+
+        assert_array_equal(vertices_min, vertices.min(axis=0))
+        assert_array_equal(vertices_max, vertices.max(axis=0))
@@ -1,10 +1,15 @@
 """Tests for stl file functions"""
 
 import numpy as np
+import stl
 from numpy.testing import assert_array_almost_equal
 
 from nexus3d.formats.interfaces import WriterInput
-from nexus3d.formats.mesh import create_cube_arrays, get_mesh_from_stl
+from nexus3d.formats.mesh import (
+    create_cube_arrays,
+    get_mesh_from_stl,
+    optimize_vertex_fetch,
+)
 from nexus3d.formats.stl_writer import write_stl_file
 
 
@@ -21,3 +26,30 @@ def test_cube_mesh_reconstruction(tmp_path):
             assert_array_almost_equal(
                 vertices[face[j], :], vertices_file[indices_file[i][j], :]
             )
+
+
+def test_vertex_fetch_optimization(tmp_path):
+    """Test that reordering the vertices for fetching keeps the triangles intact"""
+    test_file = tmp_path / "cube.stl"
+    write_stl_file(WriterInput(test_file, {"test": np.identity(4)}, 2.0, False, {}))
+
+    indices, vertices = get_mesh_from_stl(test_file)
+    indices_opt, vertices_opt = optimize_vertex_fetch(indices, vertices)
+
+    assert indices_opt.dtype == indices.dtype
+    assert_array_almost_equal(vertices[indices], vertices_opt[indices_opt])
+    _, first_use = np.unique(indices_opt.ravel(), return_index=True)
+    assert (np.diff(first_use) > 0).all()
+
+
+def test_ascii_and_binary_stl_match(tmp_path):
+    """Test whether ascii and memory-mapped binary stl files are read the same"""
+    binary_file = tmp_path / "binary.stl"
+    ascii_file = tmp_path / "ascii.stl"
+    write_stl_file(WriterInput(binary_file, {"test": np.identity(4)}, 2.0, False, {}))
+    stl.mesh.Mesh.from_file(binary_file).save(ascii_file, mode=stl.Mode.ASCII)
+
+    indices, vertices = get_mesh_from_stl(binary_file)
+    indices_ascii, vertices_ascii = get_mesh_from_stl(ascii_file)
+
+    assert_array_almost_equal(vertices[indices], vertices_ascii[indices_ascii])
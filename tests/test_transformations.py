@@ -2,17 +2,24 @@
 
 from pathlib import Path
 
+import h5py
 import numpy as np
-from numpy.testing import assert_almost_equal, assert_array_almost_equal
-from pytest import mark
+from numpy.testing import (
+    assert_almost_equal,
+    assert_array_almost_equal,
+    assert_array_equal,
+)
+from pytest import mark, raises
 from scipy.spatial.transform import Rotation
 
 from nexus3d.coordinate_systems import angle_between
-from nexus3d.matrix import rotate, translate
+from nexus3d.matrix import batch_rotate, batch_translate, rotate, translate
 from nexus3d.nexus_transformations import (
+    apply_blender_transform,
     transformation_matrices_from,
     transformation_matrices_xarray,
 )
+from nexus3d.units import _SI_FACTORS, si_factor, ureg
 
 # pylint: disable=redefined-outer-name
 
@@ -53,6 +60,66 @@ def test_correct_rotation_matrix():
         assert_array_almost_equal(nexus_matrix, rot_matrix)
 
 
+@mark.parametrize("left_handed", [False, True])
+def test_batch_matrices(left_handed):
+    """The batched matrices match the single rotation and translation matrices"""
+    angles = np.linspace(0, 2 * np.pi, 12)
+    axes = np.random.rand(12, 3)
+    offsets = np.random.rand(12, 3)
+
+    rotations = batch_rotate(angles, axes, offsets, left_handed=left_handed)
+    translations = batch_translate(axes, offsets, left_handed=left_handed)
+    for i, (angle, axis, offset) in enumerate(zip(angles, axes, offsets)):
+        assert_array_almost_equal(
+            rotations[i], rotate(angle, axis, offset, left_handed=left_handed)
+        )
+        assert_array_almost_equal(
+            translations[i],
+            translate(axis, offset, left_handed=left_handed),
+        )
+
+    assert_array_almost_equal(
+        batch_rotate(angles, axes[0])[3], rotate(angles[3], axes[0])
+    )
+
+
+def test_translate_keeps_input():
+    """Translating with an offset does not modify the translation vector"""
+    translation = np.array([1.0, 2.0, 3.0])
+    matrix = translate(translation, np.array([1.0, 1.0, 1.0]))
+
+    assert_array_almost_equal(translation, [1.0, 2.0, 3.0])
+    assert_array_almost_equal(matrix[:3, 3], [2.0, 3.0, 4.0])
+
+
+def test_blender_transform_copies():
+    """Shared, integer and read-only matrices are each rotated exactly once"""
+    shared = translate(np.array([1.0, 2.0, 3.0]))
+    read_only = translate(np.array([1.0, 2.0, 3.0]))
+    read_only.flags.writeable = False
+    integer = np.identity(4, dtype=int)
+    tmatrices = apply_blender_transform(
+        {
+            "a": shared,
+            "b": {"link": shared, "read_only": read_only, "integer": integer},
+            "c": read_only,
+        }
+    )
+
+    rotation = rotate(np.deg2rad(-90), np.array([1, 0, 0]))
+    expected = rotation @ translate(np.array([1.0, 2.0, 3.0]))
+    for matrix in [
+        tmatrices["a"],
+        tmatrices["b"]["link"],
+        tmatrices["b"]["read_only"],
+        tmatrices["c"],
+    ]:
+        assert_array_almost_equal(matrix, expected)
+    assert_array_almost_equal(tmatrices["b"]["integer"], rotation)
+    assert_array_equal(integer, np.identity(4))
+    assert_array_almost_equal(read_only, translate(np.array([1.0, 2.0, 3.0])))
+
+
 @mark.parametrize("tmatrices", get_all_matrices())
 def test_correct_chain_resolution_from_nexus(tmatrices):
     """The transformation chain is resolved to the correct matrix from a nexus file"""
@@ -158,6 +225,25 @@ def test_full_chain_extraction(tmatrices, example_file_path):
         assert_array_almost_equal(matrix, last_matrix)
 
 
+@mark.parametrize("store_intermediate", [False, True])
+@mark.parametrize("example_file_path", example_file_paths())
+def test_blender_alignment(example_file_path, store_intermediate):
+    """The blender rotated chain roots match rotating the resulting matrices"""
+    tmatrices = apply_blender_transform(
+        transformation_matrices_from(example_file_path, False, store_intermediate)
+    )
+    tmatrices_blender = transformation_matrices_from(
+        example_file_path, False, store_intermediate, blender=True
+    )
+
+    for entry, matrix in tmatrices.items():
+        if store_intermediate:
+            for link, link_matrix in matrix.items():
+                assert_array_almost_equal(tmatrices_blender[entry][link], link_matrix)
+        else:
+            assert_array_almost_equal(tmatrices_blender[entry], matrix)
+
+
 @mark.parametrize("tmatrices", get_all_matrices())
 def test_angle_between(tmatrices):
     """Test if the angle between the sample z-axis and beam axis is calculated correctly"""
@@ -169,3 +255,104 @@ def test_angle_between(tmatrices):
         angle_between(transformed_z, np.array([0, 0, -1])) / np.pi * 180,
         65,
     )
+
+
+def test_circular_chain_raises(tmp_path):
+    """A circular depends_on chain raises instead of recursing endlessly"""
+    fname = tmp_path / "circular.h5"
+    with h5py.File(fname, "w") as h5file:
+        h5file["entry/sample/depends_on"] = "/entry/sample/transformations/trans_x"
+        for name, depends_on in [("trans_x", "trans_y"), ("trans_y", "trans_x")]:
+            h5file[f"entry/sample/transformations/{name}"] = 1.0
+            h5file[f"entry/sample/transformations/{name}"].attrs.update(
+                {
+                    "depends_on": depends_on,
+                    "transformation_type": "translation",
+                    "units": "mm",
+                    "vector": [1, 0, 0],
+                }
+            )
+
+    with raises(ValueError, match="Circular"):
+        transformation_matrices_xarray(str(fname))
+
+
+def test_linked_transformations(tmp_path):
+    """Transformations reached through soft or hard links are found"""
+    fname = tmp_path / "linked.h5"
+    with h5py.File(fname, "w") as h5file:
+        transformations = h5file.create_group("entry/instrument/manip/transformations")
+        transformations["trans_x"] = 1.0
+        transformations["trans_x"].attrs.update(
+            {
+                "depends_on": ".",
+                "transformation_type": "translation",
+                "units": "mm",
+                "vector": [1, 0, 0],
+            }
+        )
+        h5file["entry/soft_sample/transformations"] = h5py.SoftLink(
+            "/entry/instrument/manip/transformations"
+        )
+        h5file["entry/soft_sample/depends_on"] = (
+            "/entry/soft_sample/transformations/trans_x"
+        )
+        h5file["entry/hard_sample/transformations"] = transformations
+        h5file["entry/hard_sample/depends_on"] = (
+            "/entry/hard_sample/transformations/trans_x"
+        )
+
+    tmatrices = transformation_matrices_from(str(fname), False)
+    for sample in ["soft_sample", "hard_sample"]:
+        assert_array_almost_equal(tmatrices[sample], translate(np.array([1e-3, 0, 0])))
+
+
+def test_only_depends_on_fields_are_groups(tmp_path):
+    """Only `depends_on` fields, including one at the root, start a chain"""
+    fname = tmp_path / "depends_on_names.h5"
+    with h5py.File(fname, "w") as h5file:
+        h5file["entry/sample/depends_on"] = "/entry/sample/transformations/trans_x"
+        h5file["entry/sample/depends_on_comment"] = "not a depends_on field"
+        h5file["depends_on"] = "/entry/sample/transformations/trans_x"
+        h5file["entry/sample/transformations/trans_x"] = 1.0
+        h5file["entry/sample/transformations/trans_x"].attrs.update(
+            {
+                "depends_on": ".",
+                "transformation_type": "translation",
+                "units": "mm",
+                "vector": [1, 0, 0],
+            }
+        )
+
+    assert set(transformation_matrices_xarray(str(fname))) == {"sample", "depends_on"}
+
+
+def test_relative_depends_on_path(tmp_path):
+    """Relative `depends_on` paths are resolved against the node's group or the root"""
+    fname = tmp_path / "relative.h5"
+    with h5py.File(fname, "w") as h5file:
+        h5file["entry/sample/depends_on"] = "/entry/sample/transformations/trans_x"
+        for name, depends_on in [
+            ("trans_x", "../transformations/trans_y"),
+            ("trans_y", "entry/sample/transformations/trans_z"),
+            ("trans_z", "."),
+        ]:
+            h5file[f"entry/sample/transformations/{name}"] = 1.0
+            h5file[f"entry/sample/transformations/{name}"].attrs.update(
+                {
+                    "depends_on": depends_on,
+                    "transformation_type": "translation",
+                    "units": "mm",
+                    "vector": [1, 0, 0],
+                }
+            )
+
+    tmatrices = transformation_matrices_from(str(fname), False)
+    assert_array_almost_equal(tmatrices["sample"], translate(np.array([3e-3, 0, 0])))
+
+
+def test_si_factor_table():
+    """The tabulated unit factors match the pint conversion"""
+    for unit, factor in _SI_FACTORS.items():
+        assert factor == ureg.Quantity(1, unit).to_base_units().magnitude
+        assert si_factor(unit) == factor